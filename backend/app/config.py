@@ -1,8 +1,37 @@
 import os
+import json
+import re
+from functools import cached_property
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Los nombres de tenant forman parte del nombre de la colección de pgvector.
+_TENANT_NAME_RE = re.compile(r"[A-Za-z0-9_-]{1,63}")
+
+
+def _parse_tenants(raw: str) -> tuple[dict, list[str]]:
+    """
+    Interpreta la variable TENANTS. Devuelve los tenants válidos y la lista de
+    errores encontrados (las entradas inválidas se descartan).
+    """
+    try:
+        tenants = json.loads(raw or "{}")
+    except json.JSONDecodeError as e:
+        return {}, [f"TENANTS no es un JSON válido ({e})."]
+    if not isinstance(tenants, dict):
+        return {}, ["TENANTS debe ser un objeto JSON {tenant: {database_url, db_schema}}."]
+
+    valid, errors = {}, []
+    for name, source in tenants.items():
+        if not _TENANT_NAME_RE.fullmatch(name):
+            errors.append(f"nombre de tenant inválido en TENANTS: '{name}'.")
+        elif not isinstance(source, dict) or not source.get("database_url"):
+            errors.append(f"el tenant '{name}' de TENANTS necesita un 'database_url'.")
+        else:
+            valid[name] = source
+    return valid, errors
+
 class Settings:
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4")
@@ -11,6 +40,22 @@ class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
     # Esquema de Postgres a introspectar (normalmente "public").
     DB_SCHEMA: str = os.getenv("DB_SCHEMA", "public")
+    # Multi-tenant: nombre del tenant que usa DATABASE_URL/DB_SCHEMA como fuente
+    # del esquema. Es el que se usa cuando una petición no indica tenant.
+    DEFAULT_TENANT: str = os.getenv("DEFAULT_TENANT", "default")
+    # Fuentes de esquema adicionales, como JSON:
+    #   {"acme": {"database_url": "postgresql://...", "db_schema": "public"}, ...}
+    # La base vectorial y rag_schema_meta siguen viviendo en DATABASE_URL; cada
+    # tenant tiene su propia colección de pgvector y su propio fingerprint.
+    # Se interpreta con _parse_tenants(); validate() informa de los errores.
+    TENANTS_JSON: str = os.getenv("TENANTS", "")
+    _tenant_errors_reported: bool = False
+    # Máximo de tenants con servicios "calientes" (RAG + LLM) en memoria por proceso.
+    TENANT_CACHE_SIZE: int = int(os.getenv("TENANT_CACHE_SIZE", "8"))
+    # Perfil de columnas (pg_stats) inyectado en el prompt: tope de caracteres y
+    # cada cuántos segundos se comprueba si hubo un ANALYZE nuevo (0 = solo al sincronizar).
+    COLUMN_PROFILE_MAX_CHARS: int = int(os.getenv("COLUMN_PROFILE_MAX_CHARS", "1500"))
+    COLUMN_STATS_REFRESH_SECONDS: int = int(os.getenv("COLUMN_STATS_REFRESH_SECONDS", "600"))
     # Token opcional para proteger el endpoint POST /resync. Si está vacío, el
     # endpoint queda abierto (útil en desarrollo).
     RESYNC_TOKEN: str = os.getenv("RESYNC_TOKEN", "")
@@ -23,7 +68,48 @@ class Settings:
         if not self.OPENAI_API_KEY:
             print("ERROR: OPENAI_API_KEY no está configurada.")
             is_valid = False
+        if not _TENANT_NAME_RE.fullmatch(self.DEFAULT_TENANT):
+            print(f"ERROR: DEFAULT_TENANT no es un nombre de tenant válido: '{self.DEFAULT_TENANT}'.")
+            is_valid = False
+        _, tenant_errors = self._tenant_config
+        if tenant_errors:
+            # validate() se llama cada vez que se carga un tenant: los errores de
+            # TENANTS no cambian, así que se imprimen una sola vez.
+            if not self._tenant_errors_reported:
+                for error in tenant_errors:
+                    print(f"ERROR: {error}")
+                self._tenant_errors_reported = True
+            is_valid = False
         return is_valid
 
+    @cached_property
+    def _tenant_config(self) -> tuple[dict, list[str]]:
+        return _parse_tenants(self.TENANTS_JSON)
+
+    @property
+    def TENANTS(self) -> dict:
+        """Tenants válidos de TENANTS (los errores los informa validate())."""
+        return self._tenant_config[0]
+
+    def get_tenant_source(self, tenant: str | None = None) -> dict | None:
+        """
+        Devuelve la fuente del esquema de un tenant: {"database_url", "db_schema"}.
+
+        El tenant por defecto usa DATABASE_URL/DB_SCHEMA. Devuelve None si el
+        tenant no está configurado (o si su nombre no es válido).
+        """
+        tenant = tenant or self.DEFAULT_TENANT
+        if not _TENANT_NAME_RE.fullmatch(tenant):
+            return None
+        if tenant in self.TENANTS:
+            source = self.TENANTS[tenant]
+            return {
+                "database_url": source["database_url"],
+                "db_schema": source.get("db_schema", "public"),
+            }
+        if tenant == self.DEFAULT_TENANT:
+            return {"database_url": self.DATABASE_URL, "db_schema": self.DB_SCHEMA}
+        return None
+
 # Instancia global de configuración
 settings = Settings()
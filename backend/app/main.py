@@ -1,6 +1,8 @@
 import os
 import json
-from fastapi import FastAPI, HTTPException, Header
+from typing import NamedTuple
+
+from fastapi import FastAPI, HTTPException, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
@@ -8,11 +10,14 @@ from app.config import settings
 from app.services.rag_service import RAGServicePGVector
 from app.services.sql_generator import SQLGeneratorService
 from app.services.schema_introspector import fetch_schema_metadata, compute_schema_fingerprint
+from app.services.tenant_registry import TenantRegistry
 
 # --- Modelos de Datos (Pydantic) ---
 
 class AskRequest(BaseModel):
     question: str
+    # Tenant (base de datos) a consultar. Si se omite, se usa DEFAULT_TENANT.
+    tenant: str | None = None
 
 class AskResponse(BaseModel):
     sql_query: str
@@ -46,19 +51,67 @@ app.add_middleware(
 
 # --- Inicialización de Servicios ---
 
-rag_service = RAGServicePGVector()
-sql_generator = SQLGeneratorService(rag_service)
+class TenantServices(NamedTuple):
+    rag_service: RAGServicePGVector
+    sql_generator: SQLGeneratorService
+
+
+def _create_tenant_services(tenant: str) -> TenantServices:
+    """Construye los servicios de un tenant (sin sincronizar su base vectorial)."""
+    rag_service = RAGServicePGVector(tenant)
+    return TenantServices(rag_service, SQLGeneratorService(rag_service))
+
+
+def _warm_tenant_services(services: TenantServices):
+    """
+    Sincroniza (sin forzar) la base vectorial de un tenant recién cargado.
+
+    Solo re-vectoriza si el esquema cambió, así que "calentar" un tenant que ya
+    tiene vectores cuesta una introspección.
+
+    Los errores se propagan: así el registro no publica un tenant sin vectores y
+    la siguiente petición vuelve a intentarlo.
+    """
+    tenant = services.rag_service.tenant
+    result = run_vector_sync(services, force=False)
+    if result["status"] == "no_metadata" and not services.rag_service.has_vectors():
+        raise RuntimeError(
+            f"No se pudo leer el esquema del tenant '{tenant}' y no tiene base vectorial previa."
+        )
+    print(f"ℹ️  Sincronización de '{tenant}': {result['status']} ({len(result['tables'])} tablas).")
+
+
+tenant_registry = TenantRegistry(
+    _create_tenant_services,
+    max_size=settings.TENANT_CACHE_SIZE,
+    warm=_warm_tenant_services,
+    close=lambda services: services.rag_service.close(),
+)
+
+
+def _get_tenant_services(tenant: str | None, warm: bool = True) -> TenantServices:
+    """
+    Resuelve el tenant de la petición (404 si no está configurado).
+
+    Si el tenant no estaba cargado, se construyen sus servicios y, con warm=True,
+    se sincroniza su base vectorial antes de usarlos.
+    """
+    tenant = tenant or settings.DEFAULT_TENANT
+    if settings.get_tenant_source(tenant) is None:
+        raise HTTPException(status_code=404, detail=f"Tenant desconocido: '{tenant}'.")
+    return tenant_registry.get(tenant, warm=warm)
 
 # --- Eventos de Ciclo de Vida ---
 
-def _load_metadata_from_db() -> list | None:
+def _load_metadata_from_db(tenant: str) -> list | None:
     """Intenta leer el esquema en vivo desde Postgres. Devuelve None si no aplica."""
-    if not settings.DATABASE_URL:
-        print("ℹ️  DATABASE_URL no configurada. Se usará metadata_seed.json como respaldo.")
+    source = settings.get_tenant_source(tenant)
+    if not source or not source["database_url"]:
+        print(f"ℹ️  Sin base de datos configurada para el tenant '{tenant}'.")
         return None
     try:
-        metadata = fetch_schema_metadata()
-        print(f"✅ Esquema leído en vivo desde la base de datos ({len(metadata)} tablas).")
+        metadata = fetch_schema_metadata(source["database_url"], source["db_schema"])
+        print(f"✅ Esquema de '{tenant}' leído en vivo desde la base de datos ({len(metadata)} tablas).")
         return metadata
     except Exception as e:
         print(f"⚠️  No se pudo leer el esquema desde la base de datos ({e}). "
@@ -79,9 +132,9 @@ def _load_metadata_from_json() -> list:
         return json.load(f)
 
 
-def run_vector_sync(force: bool = False) -> dict:
+def run_vector_sync(services: TenantServices, force: bool = False) -> dict:
     """
-    Sincroniza la base vectorial (pgvector en Supabase) con el esquema actual.
+    Sincroniza la base vectorial (pgvector en Supabase) de un tenant con su esquema actual.
 
     Solo re-vectoriza si el esquema cambió (comparando el fingerprint), si aún no
     existe base vectorial, o si se fuerza (force=True). En el caso normal (esquema
@@ -89,10 +142,14 @@ def run_vector_sync(force: bool = False) -> dict:
 
     Devuelve un resumen de lo que ocurrió (útil para logs y para /resync).
     """
+    rag_service = services.rag_service
+    tenant = rag_service.tenant
+
     # Fuente de verdad preferida: el esquema real de la base de datos.
-    # Si no hay conexión disponible, se recurre al JSON de respaldo.
-    seed_data = _load_metadata_from_db()
-    if seed_data is None:
+    # Si no hay conexión disponible, el tenant por defecto recurre al JSON de respaldo.
+    seed_data = _load_metadata_from_db(tenant)
+    if seed_data is None and tenant == settings.DEFAULT_TENANT:
+        print("ℹ️  Se usará metadata_seed.json como respaldo.")
         seed_data = _load_metadata_from_json()
 
     if not seed_data:
@@ -105,7 +162,12 @@ def run_vector_sync(force: bool = False) -> dict:
 
     if up_to_date and not force:
         print("✅ La base vectorial ya está al día (el esquema no cambió). No se re-vectoriza.")
-        return {"status": "up_to_date", "rebuilt": False, "tables": rag_service.get_available_tables()}
+        return {
+            "status": "up_to_date",
+            "rebuilt": False,
+            "tables": rag_service.get_available_tables(),
+            "profiled_tables": _sync_column_profiles(rag_service, force=False),
+        }
 
     if force:
         reason = "resync forzado"
@@ -116,15 +178,32 @@ def run_vector_sync(force: bool = False) -> dict:
 
     print(f"🔁 Reconstruyendo la base vectorial ({reason})...")
     rag_service.rebuild(seed_data, fingerprint)
-    return {"status": "rebuilt", "reason": reason, "rebuilt": True, "tables": rag_service.get_available_tables()}
+    return {
+        "status": "rebuilt",
+        "reason": reason,
+        "rebuilt": True,
+        "tables": rag_service.get_available_tables(),
+        # Tras reconstruir, las columnas pueden haber cambiado: se re-perfila todo.
+        "profiled_tables": _sync_column_profiles(rag_service, force=True),
+    }
+
+
+def _sync_column_profiles(rag_service: RAGServicePGVector, force: bool) -> int:
+    """Refresca el perfil de columnas (pg_stats). Un fallo no impide la sincronización."""
+    try:
+        return rag_service.refresh_column_profiles(force=force)
+    except Exception as e:
+        print(f"⚠️  No se pudo actualizar el perfil de columnas: {e}")
+        return 0
 
 
 @app.on_event("startup")
 async def sync_vector_store():
+    # Solo se calienta el tenant por defecto; el resto se carga (y sincroniza)
+    # bajo demanda en su primera petición.
     print("🚀 Aplicación iniciada. Sincronizando la base vectorial...")
     try:
-        result = run_vector_sync(force=False)
-        print(f"ℹ️  Sincronización: {result['status']} ({len(result['tables'])} tablas).")
+        tenant_registry.get(settings.DEFAULT_TENANT)
     except Exception as e:
         print(f"❌ Error crítico al sincronizar la base vectorial: {e}")
 
@@ -135,7 +214,10 @@ def read_root():
     return {"message": "Bienvenido a SQL Query Buddy API"}
 
 @app.post("/resync", tags=["RAG"])
-def resync_vector_store(x_resync_token: str | None = Header(default=None)):
+def resync_vector_store(
+    tenant: str | None = Query(default=None),
+    x_resync_token: str | None = Header(default=None),
+):
     """
     Fuerza la re-vectorización del esquema sin reiniciar el servicio.
 
@@ -145,42 +227,63 @@ def resync_vector_store(x_resync_token: str | None = Header(default=None)):
     if settings.RESYNC_TOKEN and x_resync_token != settings.RESYNC_TOKEN:
         raise HTTPException(status_code=401, detail="Token de resync inválido o ausente.")
     try:
-        return run_vector_sync(force=True)
+        # La sincronización forzada ya cubre la del arranque: no se re-vectoriza dos veces.
+        services = _get_tenant_services(tenant, warm=False)
+        return run_vector_sync(services, force=True)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al re-sincronizar la base vectorial: {e}")
 
 @app.get("/health", response_model=HealthCheckResponse)
 async def health_check():
+    # peek(): un health check no debe cargar el tenant ni alterar el orden de la LRU.
+    services = tenant_registry.peek(settings.DEFAULT_TENANT)
+    if services is None:
+        openai_status = vector_db_status = "not loaded"
+    else:
+        rag_service = services.rag_service
+        openai_status = rag_service.query_openai("health check")
+        vector_db_status = "connected" if rag_service.vector_store else "disconnected"
     return {
         "status": "ok",
         "services": {
-            "openai_embeddings": rag_service.query_openai("health check"),
-            "vector_db": "connected" if rag_service.vector_store else "disconnected"
+            "openai_embeddings": openai_status,
+            "vector_db": vector_db_status,
+            "loaded_tenants": tenant_registry.loaded_tenants(),
         }
     }
 
 @app.get("/tables")
-def get_tables():
+def get_tables(tenant: str | None = Query(default=None)):
     try:
-        table_names = rag_service.get_available_tables()
+        services = _get_tenant_services(tenant)
+        table_names = services.rag_service.get_available_tables()
         return {
             "tables": [{"name": name} for name in table_names],
             "count": len(table_names)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo tablas: {e}")
 
 @app.post("/ask", response_model=AskResponse, tags=["SQL Generation"])
-async def ask_question(request: AskRequest) -> AskResponse:
+def ask_question(request: AskRequest) -> AskResponse:
+    # Función síncrona: FastAPI la ejecuta en el threadpool, así que cargar un
+    # tenant (introspección, embeddings, locks del registro) no bloquea el event loop.
     try:
         print(f"🚀 Recibida pregunta para generar SQL: '{request.question}'")
-        result = sql_generator.generate_sql_query(request.question)
+        services = _get_tenant_services(request.tenant)
+        result = services.sql_generator.generate_sql_query(request.question)
         
         return AskResponse(
             sql_query=result["sql"],
             explanation=result["explanation"],
             optimization=result["optimization"]
         )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error generando SQL: {e}")
         raise HTTPException(status_code=500, detail=f"Error interno al generar la consulta SQL: {e}")
\ No newline at end of file
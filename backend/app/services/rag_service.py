@@ -8,9 +8,19 @@ y el backend puede ser sin estado (ideal para Render free, que no tiene disco).
 Además, guarda un "fingerprint" (hash) del esquema en la tabla `rag_schema_meta`.
 Al arrancar, la app compara el fingerprint actual con el guardado y solo re-vectoriza
 cuando el esquema cambió (ahorra llamadas de embeddings y tiempo de arranque).
+
+Multi-tenant: cada tenant tiene su propia colección de vectores y su propia fila
+en `rag_schema_meta` (clave `tenant`). Todas viven en la base de DATABASE_URL.
+
+Junto al fingerprint se cachea el perfil de columnas leído de `pg_stats`. No forma
+parte del fingerprint (un ANALYZE no obliga a re-vectorizar): se refresca por tabla
+cuando cambia su último ANALYZE, y solo se añaden al prompt los perfiles de las
+columnas recuperadas.
 """
 
 import json
+import re
+import time
 
 import psycopg2
 from langchain_openai import OpenAIEmbeddings
@@ -18,11 +28,23 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores.pgvector import PGVector
 
 from app.config import settings
+from app.services.schema_introspector import (
+    fetch_column_profiles,
+    fetch_stats_stamps,
+    is_enum_like,
+)
 
 # Nombre de la colección de vectores dentro de pgvector.
 COLLECTION_NAME = "sql_buddy_schema"
 
 
+def collection_name_for(tenant: str) -> str:
+    """Colección de pgvector de un tenant. El tenant por defecto conserva la original."""
+    if tenant == settings.DEFAULT_TENANT:
+        return COLLECTION_NAME
+    return f"{COLLECTION_NAME}__{tenant}"
+
+
 def _to_sqlalchemy_url(database_url: str) -> str:
     """PGVector usa SQLAlchemy, que requiere el driver explícito psycopg2."""
     for prefix in ("postgresql://", "postgres://"):
@@ -31,10 +53,53 @@ def _to_sqlalchemy_url(database_url: str) -> str:
     return database_url
 
 
+def _dispose_vector_store(vector_store):
+    """Cada PGVector crea su propio engine de SQLAlchemy; se cierra su pool explícitamente
+    para no acumular conexiones abiertas contra DATABASE_URL hasta el garbage collector."""
+    engine = getattr(vector_store, "_bind", None)
+    if engine is not None and hasattr(engine, "dispose"):
+        engine.dispose()
+
+
+def _format_column_profile(table_name: str, column_name: str, profile: dict) -> str:
+    """Una línea compacta por columna, p. ej.:
+
+        ventas.estado: valores 'shipped' (62%), 'pending' (31%); ~3 distintos
+    """
+    parts = []
+    n_distinct = profile.get("n_distinct") or 0
+    common_values = profile.get("common_values") or []
+    # Solo en columnas tipo "enum": en las de alta cardinalidad los "valores
+    # frecuentes" son datos de filas que no ayudan y gastan el presupuesto.
+    if common_values and is_enum_like(n_distinct, profile.get("distinct_estimate")):
+        freqs = profile.get("common_freqs") or []
+        values = []
+        for i, value in enumerate(common_values):
+            literal = "'" + value.replace("'", "''") + "'"
+            if i < len(freqs):
+                literal += f" ({freqs[i]:.0%})"
+            values.append(literal)
+        parts.append("valores " + ", ".join(values))
+    if profile.get("range"):
+        low, high = profile["range"]
+        parts.append(f"rango de {low} a {high}")
+    if n_distinct == -1:
+        parts.append("único por fila")
+    elif profile.get("distinct_estimate"):
+        parts.append(f"~{profile['distinct_estimate']} distintos")
+    elif n_distinct < 0:
+        parts.append(f"~{-n_distinct:.0%} de filas distintas")
+    if profile.get("null_frac"):
+        parts.append(f"nulos {profile['null_frac']:.0%}")
+    if not parts:
+        return ""
+    return f"{table_name}.{column_name}: " + "; ".join(parts)
+
+
 class RAGServicePGVector:
-    """Gestiona la base vectorial (pgvector) y el fingerprint del esquema."""
+    """Gestiona la base vectorial (pgvector) y el fingerprint del esquema de un tenant."""
 
-    def __init__(self):
+    def __init__(self, tenant: str | None = None):
         if not settings.validate():
             raise ValueError("Configuración inválida. Revisa las variables de entorno.")
         if not settings.DATABASE_URL:
@@ -47,34 +112,62 @@ class RAGServicePGVector:
             chunk_size=1000, chunk_overlap=100, length_function=len
         )
         self.connection_string = _to_sqlalchemy_url(settings.DATABASE_URL)
+        self.tenant = tenant or settings.DEFAULT_TENANT
+        self.collection_name = collection_name_for(self.tenant)
 
         # Apunta a la colección existente (la crea si aún no existe).
         self.vector_store = PGVector(
             connection_string=self.connection_string,
             embedding_function=self.embeddings,
-            collection_name=COLLECTION_NAME,
+            collection_name=self.collection_name,
         )
         self._ensure_meta_table()
-        print("✅ Servicio RAG con pgvector inicializado.")
+        # {tabla: {"analyzed_at": str | None, "columns": {columna: perfil}}}
+        self.column_profiles = self._load_column_profiles()
+        self._profiles_checked_at = 0.0
+        print(f"✅ Servicio RAG con pgvector inicializado (tenant '{self.tenant}').")
 
     # ---------------------------------------------------------------
-    # Metadatos / fingerprint (tabla rag_schema_meta)
+    # Metadatos / fingerprint (tabla rag_schema_meta, una fila por tenant)
     # ---------------------------------------------------------------
     def _ensure_meta_table(self):
         conn = psycopg2.connect(settings.DATABASE_URL)
         try:
             with conn.cursor() as cur:
+                # Serializa la creación/migración entre réplicas que arrancan a la
+                # vez (el lock se libera con el commit de esta transacción).
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('rag_schema_meta'))")
                 cur.execute(
                     """
                     CREATE TABLE IF NOT EXISTS rag_schema_meta (
-                        id integer PRIMARY KEY DEFAULT 1,
+                        tenant text PRIMARY KEY,
                         fingerprint text,
                         tables jsonb,
-                        updated_at timestamptz DEFAULT now(),
-                        CONSTRAINT rag_schema_meta_single_row CHECK (id = 1)
+                        updated_at timestamptz DEFAULT now()
                     )
                     """
                 )
+                # Migra la tabla antigua de una sola fila (id = 1): esa fila pasa
+                # a ser la del tenant por defecto.
+                cur.execute(
+                    """
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_schema = current_schema()
+                      AND table_name = 'rag_schema_meta'
+                      AND column_name = 'id'
+                    """
+                )
+                if cur.fetchone():
+                    cur.execute("ALTER TABLE rag_schema_meta ADD COLUMN IF NOT EXISTS tenant text")
+                    cur.execute(
+                        "UPDATE rag_schema_meta SET tenant = %s WHERE tenant IS NULL",
+                        (settings.DEFAULT_TENANT,),
+                    )
+                    cur.execute("ALTER TABLE rag_schema_meta DROP COLUMN id")
+                    cur.execute("ALTER TABLE rag_schema_meta ADD PRIMARY KEY (tenant)")
+                cur.execute(
+                    "ALTER TABLE rag_schema_meta ADD COLUMN IF NOT EXISTS column_profiles jsonb"
+                )
             conn.commit()
         finally:
             conn.close()
@@ -84,7 +177,9 @@ class RAGServicePGVector:
         conn = psycopg2.connect(settings.DATABASE_URL)
         try:
             with conn.cursor() as cur:
-                cur.execute("SELECT fingerprint FROM rag_schema_meta WHERE id = 1")
+                cur.execute(
+                    "SELECT fingerprint FROM rag_schema_meta WHERE tenant = %s", (self.tenant,)
+                )
                 row = cur.fetchone()
                 return row[0] if row else None
         except Exception as e:
@@ -99,14 +194,14 @@ class RAGServicePGVector:
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    INSERT INTO rag_schema_meta (id, fingerprint, tables, updated_at)
-                    VALUES (1, %s, %s, now())
-                    ON CONFLICT (id) DO UPDATE
+                    INSERT INTO rag_schema_meta (tenant, fingerprint, tables, updated_at)
+                    VALUES (%s, %s, %s, now())
+                    ON CONFLICT (tenant) DO UPDATE
                     SET fingerprint = EXCLUDED.fingerprint,
                         tables = EXCLUDED.tables,
                         updated_at = now()
                     """,
-                    (fingerprint, json.dumps(tables)),
+                    (self.tenant, fingerprint, json.dumps(tables)),
                 )
             conn.commit()
         finally:
@@ -117,7 +212,7 @@ class RAGServicePGVector:
         conn = psycopg2.connect(settings.DATABASE_URL)
         try:
             with conn.cursor() as cur:
-                cur.execute("SELECT tables FROM rag_schema_meta WHERE id = 1")
+                cur.execute("SELECT tables FROM rag_schema_meta WHERE tenant = %s", (self.tenant,))
                 row = cur.fetchone()
                 if row and row[0]:
                     return sorted(row[0])
@@ -131,6 +226,120 @@ class RAGServicePGVector:
     def has_vectors(self) -> bool:
         return bool(self.get_available_tables())
 
+    # ---------------------------------------------------------------
+    # Perfil de columnas (pg_stats)
+    # ---------------------------------------------------------------
+    def _load_column_profiles(self) -> dict:
+        conn = psycopg2.connect(settings.DATABASE_URL)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT column_profiles FROM rag_schema_meta WHERE tenant = %s", (self.tenant,)
+                )
+                row = cur.fetchone()
+                return row[0] if row and row[0] else {}
+        except Exception as e:
+            print(f"⚠️  No se pudo leer el perfil de columnas: {e}")
+            return {}
+        finally:
+            conn.close()
+
+    def _save_column_profiles(self, profiles: dict):
+        conn = psycopg2.connect(settings.DATABASE_URL)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO rag_schema_meta (tenant, column_profiles)
+                    VALUES (%s, %s)
+                    ON CONFLICT (tenant) DO UPDATE
+                    SET column_profiles = EXCLUDED.column_profiles
+                    """,
+                    (self.tenant, json.dumps(profiles)),
+                )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def refresh_column_profiles(self, force: bool = False) -> int:
+        """
+        Actualiza el perfil de columnas de las tablas cuyo ANALYZE cambió.
+
+        Compara la fecha del último ANALYZE de cada tabla con la guardada y solo
+        vuelve a leer `pg_stats` de las que difieren (todas si force=True).
+        Devuelve el número de tablas refrescadas.
+        """
+        self._profiles_checked_at = time.monotonic()
+        source = settings.get_tenant_source(self.tenant)
+        if not source or not source["database_url"]:
+            return 0
+
+        tables = self.get_available_tables()
+        stamps = fetch_stats_stamps(tables, source["database_url"], source["db_schema"])
+        cached = self.column_profiles
+        stale = [
+            table_name for table_name in tables
+            if force
+            or table_name not in cached
+            or cached[table_name].get("analyzed_at") != stamps.get(table_name)
+        ]
+        removed = [table_name for table_name in cached if table_name not in tables]
+        if not stale and not removed:
+            return 0
+
+        profiles = {
+            table_name: entry for table_name, entry in cached.items()
+            if table_name in tables
+        }
+        fresh = fetch_column_profiles(stale, source["database_url"], source["db_schema"])
+        for table_name in stale:
+            profiles[table_name] = {
+                "analyzed_at": stamps.get(table_name),
+                "columns": fresh.get(table_name, {}),
+            }
+        self._save_column_profiles(profiles)
+        self.column_profiles = profiles
+        print(f"📊 Perfil de columnas actualizado para {len(stale)} tablas (tenant '{self.tenant}').")
+        return len(stale)
+
+    def _maybe_refresh_column_profiles(self):
+        """Revisa, como mucho cada COLUMN_STATS_REFRESH_SECONDS, si hubo un ANALYZE nuevo."""
+        interval = settings.COLUMN_STATS_REFRESH_SECONDS
+        if interval <= 0 or time.monotonic() - self._profiles_checked_at < interval:
+            return
+        try:
+            self.refresh_column_profiles()
+        except Exception as e:
+            print(f"⚠️  No se pudo refrescar el perfil de columnas: {e}")
+
+    def _build_column_profile_context(self, relevant_tables: list) -> str:
+        """
+        Resume el perfil de las columnas que aparecen en los fragmentos recuperados,
+        sin superar COLUMN_PROFILE_MAX_CHARS.
+        """
+        lines = []
+        used = 0
+        seen = set()
+        for table in relevant_tables:
+            table_name = table["metadata"].get("table_name")
+            entry = self.column_profiles.get(table_name)
+            if not entry:
+                continue
+            for column_name, profile in entry.get("columns", {}).items():
+                if (table_name, column_name) in seen:
+                    continue
+                if not re.search(rf"\b{re.escape(column_name)}\b", table["content"]):
+                    continue
+                seen.add((table_name, column_name))
+                line = _format_column_profile(table_name, column_name, profile)
+                if not line:
+                    continue
+                if used + len(line) + 1 > settings.COLUMN_PROFILE_MAX_CHARS:
+                    return "\n".join(lines)
+                lines.append(line)
+                used += len(line) + 1
+        return "\n".join(lines)
+
     # ---------------------------------------------------------------
     # Reconstrucción de la base vectorial
     # ---------------------------------------------------------------
@@ -153,16 +362,18 @@ class RAGServicePGVector:
             )
 
         # pre_delete_collection=True limpia la colección antes de insertar los nuevos vectores.
+        previous_store = self.vector_store
         self.vector_store = PGVector.from_documents(
             documents=documents,
             embedding=self.embeddings,
-            collection_name=COLLECTION_NAME,
+            collection_name=self.collection_name,
             connection_string=self.connection_string,
             pre_delete_collection=True,
         )
+        _dispose_vector_store(previous_store)
         self._save_meta(fingerprint, table_names)
         print(
-            f"✅ Base vectorial reconstruida en pgvector "
+            f"✅ Base vectorial del tenant '{self.tenant}' reconstruida en pgvector "
             f"({len(table_names)} tablas, {len(documents)} fragmentos)."
         )
 
@@ -190,8 +401,21 @@ class RAGServicePGVector:
         context = "Aquí están los esquemas de las tablas relevantes para la pregunta:\n\n"
         for table in relevant_tables:
             context += f"---\n{table['content']}\n---\n"
+
+        self._maybe_refresh_column_profiles()
+        profile_context = self._build_column_profile_context(relevant_tables)
+        if profile_context:
+            context += (
+                "\nEstadísticas de columnas (pg_stats; valores frecuentes con su frecuencia, "
+                "rango aproximado, cardinalidad y nulos):\n"
+                f"{profile_context}\n"
+            )
         return context
 
+    def close(self):
+        """Cierra el pool de conexiones de la base vectorial (al descartar el tenant)."""
+        _dispose_vector_store(self.vector_store)
+
     def query_openai(self, text: str) -> str:
         """Prueba de conexión con OpenAI para el health check."""
         try:
@@ -9,6 +9,10 @@ dinámica, la misma estructura de metadatos que consume el servicio RAG:
     [{ "table_name": str, "schema_info": str, "description": str }, ...]
 
 De esta manera la base de datos es la única fuente de verdad del esquema.
+
+También lee de `pg_stats` un perfil compacto por columna (valores más comunes,
+n_distinct, fracción de nulos y rango del histograma). Son las estadísticas que
+ya recoge ANALYZE, así que no se escanea ninguna tabla de usuario.
 """
 
 import hashlib
@@ -22,6 +26,25 @@ from app.config import settings
 # Se excluyen de la introspección para no vectorizarlas como si fueran datos.
 _EXCLUDED_TABLES = ("langchain_pg_collection", "langchain_pg_embedding", "rag_schema_meta")
 
+# Límites del perfil de columnas: cuántos valores frecuentes se guardan y la
+# longitud máxima de cada uno. Los valores más largos se descartan en vez de
+# recortarse: el LLM los usaría como literales exactos y no coincidirían.
+_MAX_COMMON_VALUES = 10
+_MAX_VALUE_LENGTH = 40
+# Solo se guardan valores frecuentes de columnas tipo "enum" (pocos valores
+# distintos). En columnas de alta cardinalidad (emails, nombres...) serían datos
+# de filas que no ayudan y ocuparían el presupuesto del prompt.
+_MAX_ENUM_DISTINCT = _MAX_COMMON_VALUES * 5
+# ...y que además se repitan: en tablas pequeñas, una columna de emails también
+# tiene pocos distintos, pero casi uno por fila.
+_MAX_ENUM_DISTINCT_FRACTION = 0.5
+# El rango (extremos del histograma) solo se guarda para tipos ordenables
+# escalares: en texto serían valores reales de filas y no ayudan a filtrar.
+_RANGE_TYPES = {
+    "smallint", "integer", "bigint", "numeric", "real", "double precision",
+    "date", "timestamp without time zone", "timestamp with time zone",
+}
+
 
 def compute_schema_fingerprint(metadata: list[dict]) -> str:
     """
@@ -82,19 +105,21 @@ def _build_schema_info(columns: list, primary_keys: set) -> str:
     return ", ".join(parts)
 
 
-def fetch_schema_metadata() -> list[dict]:
+def fetch_schema_metadata(database_url: str | None = None, schema: str | None = None) -> list[dict]:
     """
     Introspecta la base de datos y devuelve los metadatos de todas las tablas
-    del esquema configurado (por defecto "public").
+    del esquema indicado. Sin argumentos usa DATABASE_URL y DB_SCHEMA (por
+    defecto "public"); en modo multi-tenant se pasa la fuente de cada tenant.
 
     Lanza una excepción si no hay DATABASE_URL o si la conexión falla, para que
     la capa que lo invoca pueda decidir usar el respaldo (metadata_seed.json).
     """
-    if not settings.DATABASE_URL:
+    database_url = database_url or settings.DATABASE_URL
+    if not database_url:
         raise RuntimeError("DATABASE_URL no está configurada.")
 
-    schema = settings.DB_SCHEMA
-    conn = psycopg2.connect(settings.DATABASE_URL)
+    schema = schema or settings.DB_SCHEMA
+    conn = psycopg2.connect(database_url)
     try:
         with conn.cursor() as cur:
             # 1. Columnas de todas las tablas base del esquema.
@@ -187,3 +212,173 @@ def fetch_schema_metadata() -> list[dict]:
         })
 
     return metadata
+
+
+def _parse_pg_array(text: str | None) -> list[str]:
+    """
+    Convierte un literal de array de Postgres de una dimensión ('{a,"b c",NULL}')
+    en una lista de strings. Las columnas de `pg_stats` son de tipo anyarray, así
+    que se leen como texto. Devuelve [] para arrays multidimensionales.
+    """
+    if not text or not text.startswith("{") or not text.endswith("}"):
+        return []
+    body = text[1:-1]
+    if not body:
+        return []
+
+    values, current, quoted, in_quotes, i = [], [], False, False, 0
+    while i < len(body):
+        ch = body[i]
+        if in_quotes:
+            if ch == "\\" and i + 1 < len(body):
+                i += 1
+                current.append(body[i])
+            elif ch == '"':
+                in_quotes = False
+            else:
+                current.append(ch)
+        elif ch == '"':
+            in_quotes = quoted = True
+        elif ch == ",":
+            value = "".join(current)
+            values.append(None if value == "NULL" and not quoted else value)
+            current, quoted = [], False
+        elif ch == "{":
+            return []
+        else:
+            current.append(ch)
+        i += 1
+    value = "".join(current)
+    values.append(None if value == "NULL" and not quoted else value)
+    return [v for v in values if v is not None]
+
+
+def estimate_distinct(n_distinct: float, reltuples: float) -> int | None:
+    """
+    Convierte el n_distinct de Postgres en un número estimado de valores distintos.
+
+    Cuando los distintos superan el 10% de las filas, Postgres lo guarda como una
+    fracción negativa (-0.125 = 12,5% de las filas), así que se multiplica por
+    `pg_class.reltuples`. Devuelve None si no se puede estimar.
+    """
+    if n_distinct > 0:
+        return int(n_distinct)
+    if n_distinct < 0 and reltuples > 0:
+        return max(1, round(-n_distinct * reltuples))
+    return None
+
+
+def is_enum_like(n_distinct: float, distinct_estimate: int | None) -> bool:
+    """True si la columna tiene pocos valores distintos y repetidos (tipo "enum")."""
+    if distinct_estimate is None or not 0 < distinct_estimate <= _MAX_ENUM_DISTINCT:
+        return False
+    # n_distinct positivo implica que los distintos son a lo sumo ~10% de las filas.
+    return n_distinct > 0 or -n_distinct <= _MAX_ENUM_DISTINCT_FRACTION
+
+
+def fetch_stats_stamps(tables: list[str], database_url: str | None = None,
+                       schema: str | None = None) -> dict[str, str | None]:
+    """
+    Devuelve, por tabla, la fecha del último ANALYZE (manual o autovacuum).
+
+    Es una consulta barata sobre `pg_stat_all_tables` que permite refrescar los
+    perfiles de columnas solo de las tablas cuyas estadísticas cambiaron.
+    Las tablas nunca analizadas se devuelven con None.
+    """
+    if not tables:
+        return {}
+    database_url = database_url or settings.DATABASE_URL
+    schema = schema or settings.DB_SCHEMA
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT relname, GREATEST(last_analyze, last_autoanalyze)
+                FROM pg_stat_all_tables
+                WHERE schemaname = %s
+                  AND relname IN %s
+                """,
+                (schema, tuple(tables)),
+            )
+            stamps = {
+                table_name: analyzed_at.isoformat() if analyzed_at else None
+                for table_name, analyzed_at in cur.fetchall()
+            }
+    finally:
+        conn.close()
+    return {table_name: stamps.get(table_name) for table_name in tables}
+
+
+def fetch_column_profiles(tables: list[str], database_url: str | None = None,
+                          schema: str | None = None) -> dict[str, dict]:
+    """
+    Lee de `pg_stats` el perfil de cada columna de las tablas indicadas:
+
+        {tabla: {columna: {"null_frac", "n_distinct", "distinct_estimate",
+                           "common_values", "common_freqs", "range"}}}
+
+    `n_distinct` sigue la convención de Postgres: positivo es un número de
+    valores distintos; negativo, la fracción de filas (-1 = único por fila).
+    `distinct_estimate` es ese valor convertido a número de valores distintos.
+    Los valores frecuentes solo se guardan en columnas de baja cardinalidad, y
+    nunca recortados; el rango, solo en columnas numéricas y de fecha. Las
+    tablas sin estadísticas devuelven un perfil vacío.
+    """
+    if not tables:
+        return {}
+    database_url = database_url or settings.DATABASE_URL
+    schema = schema or settings.DB_SCHEMA
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT s.tablename,
+                       s.attname,
+                       s.null_frac,
+                       s.n_distinct,
+                       s.most_common_vals::text,
+                       s.most_common_freqs,
+                       s.histogram_bounds::text,
+                       c.reltuples,
+                       format_type(a.atttypid, NULL)
+                FROM pg_stats s
+                JOIN pg_namespace n ON n.nspname = s.schemaname
+                JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = s.tablename
+                JOIN pg_attribute a ON a.attrelid = c.oid AND a.attname = s.attname
+                WHERE s.schemaname = %s
+                  AND s.tablename IN %s
+                  AND NOT s.inherited
+                """,
+                (schema, tuple(tables)),
+            )
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    profiles: dict[str, dict] = {table_name: {} for table_name in tables}
+    for (table_name, column_name, null_frac, n_distinct,
+         common_vals, common_freqs, histogram, reltuples, column_type) in rows:
+        n_distinct = round(float(n_distinct or 0), 4)
+        distinct_estimate = estimate_distinct(n_distinct, float(reltuples or 0))
+        common_values, freqs = [], []
+        if is_enum_like(n_distinct, distinct_estimate):
+            for value, freq in zip(_parse_pg_array(common_vals), common_freqs or []):
+                if len(value) > _MAX_VALUE_LENGTH:
+                    continue
+                common_values.append(value)
+                freqs.append(round(float(freq), 4))
+                if len(common_values) == _MAX_COMMON_VALUES:
+                    break
+        bounds = _parse_pg_array(histogram) if column_type in _RANGE_TYPES else []
+        has_range = bool(bounds) and max(len(bounds[0]), len(bounds[-1])) <= _MAX_VALUE_LENGTH
+        profiles[table_name][column_name] = {
+            "null_frac": round(float(null_frac or 0), 4),
+            "n_distinct": n_distinct,
+            "distinct_estimate": distinct_estimate,
+            "common_values": common_values,
+            "common_freqs": freqs,
+            "range": [bounds[0], bounds[-1]] if has_range else None,
+        }
+    return profiles
@@ -35,7 +35,8 @@ class SQLGeneratorService:
         2.  Usa los nombres de tablas y columnas exactamente como se definen en los esquemas.
         3.  Proporciona una sugerencia de optimización útil, como la creación de un índice en una columna usada en un `WHERE` o `JOIN`. Si no hay una optimización obvia, responde con "No se sugiere ninguna optimización específica.".
         4.  Si la pregunta no se puede responder con los esquemas, la `sql_query` debe ser "ERROR: La pregunta no se puede responder con el contexto proporcionado." y la explicación debe indicar por qué.
-        5.  TU SALIDA DEBE SER ÚNICAMENTE UN OBJETO JSON VÁLIDO. No incluyas texto antes o después del JSON. No uses formato markdown como ```json.
+        5.  Si el contexto incluye estadísticas de columnas, usa los literales exactamente como aparecen en los valores frecuentes (respetando mayúsculas y minúsculas) y tenlas en cuenta para rangos de fechas y cardinalidades.
+        6.  TU SALIDA DEBE SER ÚNICAMENTE UN OBJETO JSON VÁLIDO. No incluyas texto antes o después del JSON. No uses formato markdown como ```json.
         
         Contexto (Esquemas de Tablas):
         {context}
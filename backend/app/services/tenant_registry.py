@@ -0,0 +1,94 @@
+"""
+Registro de servicios por tenant con política LRU.
+
+Cada tenant necesita su propio RAGServicePGVector (colección de pgvector) y su
+propio SQLGeneratorService. Crearlos cuesta conexiones y clientes de OpenAI, así
+que se mantienen "calientes" en memoria, pero solo los `max_size` tenants usados
+más recientemente: al superar el límite se descarta el menos usado (y se cierran
+sus recursos). Así una misma flota puede servir muchos esquemas sin guardar el
+estado de todos a la vez.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable
+
+
+class TenantRegistry:
+    """Caché LRU acotada de servicios por tenant, segura entre hilos.
+
+    - `factory(tenant)` solo construye los servicios.
+    - `warm(services)` los prepara (p. ej. sincroniza la base vectorial) antes de
+      publicarlos, de modo que otras peticiones al mismo tenant esperan a que acabe.
+      Si lanza una excepción, los servicios se cierran y no se guardan.
+    - `close(services)` libera los recursos de un tenant descartado.
+    """
+
+    def __init__(self, factory: Callable[[str], Any], max_size: int = 8,
+                 warm: Callable[[Any], None] | None = None,
+                 close: Callable[[Any], None] | None = None):
+        self._factory = factory
+        self._warm = warm
+        self._close = close
+        self._max_size = max(1, max_size)
+        self._services: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        # Un lock por tenant para no construir dos veces el mismo servicio en
+        # paralelo, sin bloquear a los demás tenants mientras tanto.
+        self._build_locks: dict[str, threading.Lock] = {}
+
+    def get(self, tenant: str, warm: bool = True) -> Any:
+        """
+        Devuelve los servicios del tenant, creándolos con la factory si hace falta.
+
+        Con warm=False no se ejecuta `warm` al crearlos (útil cuando quien llama va
+        a hacer enseguida una sincronización más completa, como /resync).
+        """
+        with self._lock:
+            if tenant in self._services:
+                self._services.move_to_end(tenant)
+                return self._services[tenant]
+            build_lock = self._build_locks.setdefault(tenant, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                if tenant in self._services:
+                    self._services.move_to_end(tenant)
+                    return self._services[tenant]
+
+            services = self._factory(tenant)
+            if warm and self._warm:
+                try:
+                    self._warm(services)
+                except Exception:
+                    # No se publica: la próxima petición al tenant lo reintenta.
+                    if self._close:
+                        self._close(services)
+                    raise
+
+            evicted = []
+            with self._lock:
+                self._services[tenant] = services
+                self._services.move_to_end(tenant)
+                while len(self._services) > self._max_size:
+                    evicted.append(self._services.popitem(last=False))
+                self._build_locks.pop(tenant, None)
+
+        for evicted_tenant, evicted_services in evicted:
+            print(f"♻️  Tenant '{evicted_tenant}' descartado de la caché de servicios (LRU).")
+            if self._close:
+                try:
+                    self._close(evicted_services)
+                except Exception as e:
+                    print(f"⚠️  Error liberando los recursos del tenant '{evicted_tenant}': {e}")
+        return services
+
+    def peek(self, tenant: str) -> Any | None:
+        """Devuelve los servicios del tenant solo si ya están en memoria (sin crearlos ni
+        cambiar su posición en la LRU)."""
+        with self._lock:
+            return self._services.get(tenant)
+
+    def loaded_tenants(self) -> list[str]:
+        with self._lock:
+            return list(self._services)